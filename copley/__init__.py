@@ -4,6 +4,7 @@ Python driver for Copley JV100i Tapped Density Tester.
 Distributed under the GNU General Public License v2
 Copyright (C) 2023 NuMat Technologies
 """
+from dataclasses import asdict
 from typing import Any
 
 from copley.driver import TapDensity
@@ -30,7 +31,7 @@ def command_line(args: Any = None) -> None:
         async def get() -> None:
             async with TapDensity(address=args.address) as copley:
                 report = await copley.get_report()
-                print(json.dumps(report, indent=4))
+                print(json.dumps(asdict(report) if report else {'on': False}, indent=4))
         asyncio.run(get())
 
 
@@ -4,15 +4,77 @@ A Python driver for Copley JV100i Tapped Density Tester.
 Distributed under the GNU General Public License v2
 Copyright (C) 2023 NuMat Technologies
 """
-import asyncio
+from __future__ import annotations
+
 import logging
-from typing import Any
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Tuple
 
-from copley.util import Client, SerialClient, TcpClient
+from copley.util import EOL, Client, SerialClient, TcpClient
 
 logger = logging.getLogger('copley')
 
 
+@dataclass(frozen=True)
+class Report:
+    """Results of a tapped density run, as printed by PRINT_REPORT."""
+
+    __slots__ = (
+        'serial_number', 'calc_type', 'set_speed', 'total_taps', 'sample_weight',
+        'init_volume', 'final_volume', 'bulk_density', 'tapped_density',
+        'hausner_ratio', 'compress_index',
+    )
+    serial_number: int
+    calc_type: str
+    set_speed: str
+    total_taps: int
+    sample_weight: str
+    init_volume: str
+    final_volume: str
+    bulk_density: str
+    tapped_density: str
+    hausner_ratio: str
+    compress_index: str
+
+
+# PRINT_REPORT schema as parallel tuples: line label, report key, value converter
+_LABELS = (
+    'Serial number', 'Calculation type', 'Set Speed', 'Total Taps', 'Sample Weight, W',
+    'Initial Volume', 'Final Volume', 'Bulk Density', 'Tapped Density (g/mL)',
+    'Hausner Ratio', 'Compress. Index',
+)
+_KEYS = Report.__slots__
+_REQUIRED_KEYS = frozenset(_KEYS)
+_CONVERTERS: tuple[Callable[[str], Any], ...] = (
+    int, str, str, int, str,
+    str, str, str, str,
+    str, str,
+)
+
+
+def _index_by_prefix(
+    labels: tuple[str, ...], max_len: int = 6,
+) -> tuple[int, dict[str, list[int]]]:
+    """Bucket schema indices by label prefix, for a one-lookup first pass.
+
+    The prefix is cut to the shortest label so every label has a full-length
+    key. Labels sharing a prefix just share a bucket.
+    """
+    prefix_len = min(max_len, *map(len, labels))
+    index: dict[str, list[int]] = defaultdict(list)
+    for i, label in enumerate(labels):
+        index[label[:prefix_len]].append(i)
+    return prefix_len, dict(index)
+
+
+_PREFIX_LEN, _PREFIX_INDEX = _index_by_prefix(_LABELS)
+# (report line number, schema index) pairs. A tester's report layout is fixed,
+# so each driver learns it from its first report and then skips label matching.
+_Layout = Tuple[Tuple[int, int], ...]
+
+
 class TapDensity:
     """Driver for Copley Tapped Density Tester.
 
@@ -39,81 +101,108 @@ class TapDensity:
     READ_FIRMWARE = "V"
     RESET_TEST = "TRESET"
 
+    # Commands encoded and CR-terminated once, ready to send as-is
+    _ENCODED = {command: command.encode() + EOL for command in (
+        READ_CYCLE_COUNT, READ_CYCLE_COUNT_SP, READ_DATE, READ_DURATION, READ_DURATION_SP,
+        READ_MODEL, PRINT_REPORT, PRINT_REPORT_LEFT, PRINT_REPORT_RIGHT, READ_SPEED_INT,
+        READ_ACTUAL_SPEED, READ_SET_SPEED, READ_SERIAL_NUMBER, READ_FIRMWARE, RESET_TEST,
+    )}
+
     def __init__(self, address, **kwargs):
         """Set up connection parameters, serial or IP address and port."""
         if address.startswith('/dev') or address.startswith('COM'):  # serial
             self.hw: Client = SerialClient(address=address, **kwargs)
         else:
             self.hw = TcpClient(address=address, **kwargs)
-        self.lock = None  # needs to be initialized later, when the event loop exists
+        self._busy = False  # a driver instance has a single owner; see `query`
+        self._layout: _Layout = ()
 
-    async def __aenter__(self, *args: Any) -> 'TapDensity':
+    async def __aenter__(self, *args: Any) -> TapDensity:
         """Provide async enter to context manager."""
         return self
 
     async def __aexit__(self, *args: Any) -> None:
         """Provide async exit to context manager."""
-        return
+        await self.hw.close_async()
 
-    async def query(self, query) -> str:
-        """Query the device and return its response."""
-        if not self.lock:
-            self.lock = asyncio.Lock()
-        async with self.lock:  # lock releases on CancelledError
-            return await self.hw._write_and_read(query)
+    async def query(self, query) -> list[str] | None:
+        """Query the device and return its response.
 
-    async def get_report(self):
-        """Get run report from the tapped density tester."""
+        Queries must not overlap; a second query issued while one is in
+        flight raises RuntimeError rather than waiting its turn.
+        """
+        if self._busy:
+            raise RuntimeError("concurrent query")
+        self._busy = True
+        try:
+            return await self.hw._write_and_read(self._ENCODED.get(query, query))
+        finally:  # also clears on CancelledError
+            self._busy = False
+
+    async def get_report(self) -> Report | None:
+        """Get run report from the tapped density tester, or None if it is off."""
         response = await self.query(self.PRINT_REPORT)
         return self._parse(response)
 
     async def reset(self):
         """Reset the Copley."""
-        await self.hw._write(self.RESET_TEST)
+        await self.hw._write(self._ENCODED[self.RESET_TEST])
 
-    def _parse(self, response: str) -> dict:
+    def _parse(self, response: list[str] | None) -> Report | None:
         """Parse a tapped density report. Data output format is ASCII."""
         if response is None:
-            return {'on': False}
-        else:
-            for line in response:
-                if ":" in line:
-                    value = line.strip().split(':')[1].strip()
-                if "Serial number" in line:
-                    sn = int(value)
-                elif "Calculation type" in line:
-                    calc_type = value
-                elif "Set Speed" in line:
-                    set_speed = value
-                elif "Total Taps" in line:
-                    total_taps = int(value)
-                elif "Sample Weight, W" in line:
-                    sample_weight = value
-                elif "Initial Volume" in line:
-                    init_volume = value
-                elif "Final Volume" in line:
-                    final_volume = value
-                elif "Bulk Density" in line:
-                    bulk_density = value
-                elif "Tapped Density (g/mL)" in line:
-                    tapped_density = value
-                elif "Hausner Ratio" in line:
-                    hausner_ratio = value
-                elif "Compress. Index" in line:
-                    compress_index = value
-            try:
-                return {
-                    'serial_number': sn,
-                    'calc_type': calc_type,
-                    'set_speed': set_speed,
-                    'total_taps': total_taps,
-                    'sample_weight': sample_weight,
-                    'init_volume': init_volume,
-                    'final_volume': final_volume,
-                    'bulk_density': bulk_density,
-                    'tapped_density': tapped_density,
-                    'hausner_ratio': hausner_ratio,
-                    'compress_index': compress_index
-                }
-            except Exception as e:
-                raise e
+            return None
+        report, self._layout = _parse_report(tuple(response), self._layout)
+        return report
+
+
+@lru_cache(maxsize=8)
+def _parse_report(lines: tuple[str, ...], layout: _Layout) -> tuple[Report, _Layout]:
+    """Map the labelled lines of a PRINT_REPORT response to a Report.
+
+    Reads fields straight from `layout` when it still fits the report, and
+    returns the layout to use next time. Cached, as polling an idle device
+    returns the same report repeatedly.
+    """
+    result = _read_layout(lines, layout) if layout else None
+    if result is None:
+        result, layout = _scan_report(lines)
+        missing = _REQUIRED_KEYS - result.keys()
+        if missing:
+            raise ValueError(f"Report is missing fields: {', '.join(sorted(missing))}")
+    return Report(**result), layout
+
+
+def _read_layout(lines: tuple[str, ...], layout: _Layout) -> dict[str, Any] | None:
+    """Read fields straight from their learned line positions.
+
+    Returns None if the report no longer matches the layout (e.g. new
+    firmware), so the caller can fall back to scanning for labels.
+    """
+    result: dict[str, Any] = {}
+    try:
+        for n, i in layout:
+            line = lines[n].lstrip()
+            _, sep, value = line.partition(':')
+            if not sep or not line.startswith(_LABELS[i]):
+                return None
+            result[_KEYS[i]] = _CONVERTERS[i](value.strip())
+    except (IndexError, ValueError):
+        return None
+    return result
+
+
+def _scan_report(lines: tuple[str, ...]) -> tuple[dict[str, Any], _Layout]:
+    """Find fields by label, learning the report layout along the way."""
+    result: dict[str, Any] = {}
+    layout: list[tuple[int, int]] = []
+    for n, line in enumerate(lines):
+        line = line.lstrip()
+        for i in _PREFIX_INDEX.get(line[:_PREFIX_LEN], ()):
+            if line.startswith(_LABELS[i]):
+                _, sep, value = line.partition(':')
+                if sep:
+                    result[_KEYS[i]] = _CONVERTERS[i](value.strip())
+                    layout.append((n, i))
+                break
+    return result, tuple(layout)
@@ -1,51 +1,50 @@
 """Contains mocks for driver objects for offline testing."""
 from __future__ import annotations
 
-import asyncio
-from unittest.mock import MagicMock
-
 from .driver import TapDensity as RealTapDensity
 
+# Address of a mock tester that never answers; valid as a TCP address
+NO_RESPONSE = 'NO_RESPONSE:0'
+
+_CANNED_REPORT = [
+    'Copley Scientific',
+    'Serial number       : 12345',
+    'Calculation type    : Fixed weight',
+    'Set Speed           : 300',
+    'Total Taps          : 1250',
+    'Sample Weight, W    : 2.77',
+    'Initial Volume      : 170.0',
+    'Final Volume        : 155.0',
+    'Bulk Density        : 0.016',
+    'Tapped Density (g/mL): 0.018',
+    'Hausner Ratio       : 1.097',
+    'Compress. Index     : 8.82',
+]
+
+
+class _StubHW:
+    """Stands in for a serial or TCP client, answering with a canned report."""
+
+    def __init__(self, address=''):
+        self.address = address
+
+    async def _write_and_read(self, command):
+        """Return the canned report, or nothing if the device is 'off'."""
+        return None if self.address == NO_RESPONSE else list(_CANNED_REPORT)
 
-class AsyncClientMock(MagicMock):
-    """Magic mock that works with async methods."""
+    async def _write(self, command):
+        """Accept and discard a command."""
+        pass
 
-    async def __call__(self, *args, **kwargs):
-        """Convert regular mocks into into an async coroutine."""
-        return super().__call__(*args, **kwargs)
+    async def close_async(self):
+        """Nothing to release."""
+        pass
 
 
 class TapDensity(RealTapDensity):
     """Mocks the overhead stirrer driver for offline testing."""
 
-    def __init__(self, *args, **kwargs):
-        """Set up connection parameters with default port."""
-        super().__init__(*args, **kwargs)
-        self.hw = AsyncClientMock()
-
-    async def query(self, command):
-        """Return mock requests to query."""
-        if not self.lock:
-            self.lock = asyncio.Lock()
-        async with self.lock:  # lock releases on CancelledError
-            if command == self.PRINT_REPORT:
-                return 'hello world :)'
-
-    def _parse(self, response):
-        """Return mock requests to parsing."""
-        if response is None:
-            return {'on': False}
-        else:
-            return {
-                'serial_number': 12345,
-                'calc_type': "Fixed weight",
-                'set_speed': "300",
-                'total_taps': 1250,
-                'sample_weight': "2.77",
-                'init_volume': "170.0",
-                'final_volume': "155.0",
-                'bulk_density': "0.016",
-                'tapped_density': "0.018",
-                'hausner_ratio': "1.097",
-                'compress_index': "8.82"
-            }
+    def __init__(self, address, **kwargs):
+        """Set up the driver, then swap in a stubbed client for the hardware."""
+        super().__init__(address, **kwargs)
+        self.hw = _StubHW(address)  # type: ignore[assignment]
@@ -7,12 +7,16 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import time
 from abc import abstractmethod
+from functools import partial
 
 import serial
 
 logger = logging.getLogger('copley')
 
+EOL = b'\r'  # line terminator for commands and responses
+
 class Client:
     """Serial or TCP client."""
 
@@ -25,7 +29,7 @@ class Client:
         self.max_timeouts = 10
         self.connection = {}
         self.reconnecting = False
-        self.eol = b'\r'
+        self.eol = EOL
 
     @abstractmethod
     async def _write(self, message):
@@ -81,6 +85,10 @@ class Client:
         """Close the connection."""
         pass
 
+    async def close_async(self):
+        """Close the connection from async code."""
+        self.close()
+
 
 class TcpClient(Client):
     """A generic reconnecting asyncio TCP client.
@@ -89,9 +97,10 @@ class TcpClient(Client):
     communicating over TCP.
     """
 
-    def __init__(self, address, timeout=1):
+    def __init__(self, address, timeout=1, connect_timeout=0.75):
         """Communicator using a TCP/IP<=>serial gateway."""
         super().__init__(timeout)
+        self.connect_timeout = connect_timeout
         try:
             self.address, self.port = address.split(':')
         except ValueError as e:
@@ -111,7 +120,7 @@ class TcpClient(Client):
 
     async def __aexit__(self, *args):
         """Provide async exit to context manager."""
-        self.close()
+        await self.close_async()
 
     async def _connect(self):
         """Asynchronously open a TCP connection with the server."""
@@ -122,36 +131,39 @@ class TcpClient(Client):
 
     async def _read(self, length: int):
         """Read a fixed number of bytes from the device."""
-        await self._handle_connection()
         response = await self.connection['reader'].read(length)
         return response.decode().strip()
 
     async def _readline(self):
         """Read until a line terminator."""
-        await self._handle_connection()
         response = await self.connection['reader'].readuntil(self.eol)
         return response.decode().strip()
 
     async def _readlines(self, num_lines):
-        """Read lines."""
-        await self._handle_connection()
-        lines: list[str] = []
-        while len(lines) < num_lines:
-            try:
-                line = await self.connection['reader'].readuntil(self.eol)
-                lines.append(line.decode().strip())
-            except asyncio.CancelledError:
-                print(f'Timed out! Did not get to {num_lines} lines.')
-        return lines
+        """Read lines.
 
-    async def _write(self, command: str):
+        Buffers whatever the device has sent until it holds `num_lines`
+        terminators, then splits once, rather than awaiting each line.
+        """
+        reader = self.connection['reader']
+        data = b''
+        while data.count(self.eol) < num_lines:
+            chunk = await reader.read(1024)
+            if not chunk:
+                raise asyncio.IncompleteReadError(data, None)
+            data += chunk
+        lines = data.decode().split(self.eol.decode(), num_lines)[:num_lines]
+        return [line.strip() for line in lines]
+
+    async def _write(self, command: str | bytes):
         """Write a command and do not expect a response.
 
         As industrial devices are commonly unplugged, this has been expanded to
-        handle recovering from disconnects.
+        handle recovering from disconnects. Bytes are assumed to be terminated.
         """
-        await self._handle_connection()
-        to_write = command.encode() + self.eol
+        if not self.open:  # e.g. a bare reset(), outside _write_and_read
+            await self._handle_connection()
+        to_write = command if isinstance(command, bytes) else command.encode() + self.eol
         self.connection['writer'].write(to_write)
 
     async def _handle_connection(self):
@@ -159,7 +171,7 @@ class TcpClient(Client):
         if self.open:
             return
         try:
-            await asyncio.wait_for(self._connect(), timeout=0.75)
+            await asyncio.wait_for(self._connect(), timeout=self.connect_timeout)
             self.reconnecting = False
         except (asyncio.TimeoutError, OSError):
             if not self.reconnecting:
@@ -188,6 +200,17 @@ class TcpClient(Client):
             self.connection['writer'].close()
         self.open = False
 
+    async def close_async(self):
+        """Close the TCP connection and wait for it to finish closing."""
+        if self.open:
+            writer = self.connection['writer']
+            self.open = False
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError as e:  # the link already dropped; nothing left to close
+                logger.warning(f'Closing {self.address} failed: {e}')
+
 
 class SerialClient(Client):
     """Client using a directly-connected RS232 serial device."""
@@ -203,26 +226,90 @@ class SerialClient(Client):
                                'stopbits': stopbits,
                                'parity': parity,
                                'timeout': timeout}
-        self.ser = serial.Serial(self.address, **self.serial_details)
+        self.ser: serial.Serial | None = None  # opened on first use
+
+    async def _run(self, func, *args):
+        """Run a blocking pyserial call in a worker thread."""
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def _connect(self):
+        """Open the serial port without blocking the event loop."""
+        self.ser = await self._run(partial(serial.Serial, self.address, **self.serial_details))
+        self.open = True
+
+    def _port(self) -> serial.Serial:
+        """Return the open port, or raise if it could not be opened."""
+        if self.ser is None or not self.open:
+            raise serial.SerialException(f'{self.address} is not open.')
+        return self.ser
 
     async def _read(self, length: int):
         """Read a fixed number of bytes from the device."""
-        return self.ser.read(length).decode()
+        return (await self._run(self._port().read, length)).decode()
 
     async def _readline(self):
         """Read until a LF terminator."""
-        return self.ser.readline().strip().decode()
-
-    async def _write(self, message: str):
-        """Write a message to the device."""
-        self.ser.write(message.encode() + self.eol)
+        return (await self._run(self._port().readline)).strip().decode()
+
+    async def _write(self, message: str | bytes):
+        """Write a message to the device. Bytes are assumed to be terminated."""
+        if not self.open:  # e.g. a bare reset(), outside _write_and_read
+            await self._handle_connection()
+        to_write = message if isinstance(message, bytes) else message.encode() + self.eol
+        await self._run(self._port().write, to_write)
+
+    async def _readlines(self, num_lines, timeout=10):
+        """Read lines in a worker thread so the event loop is not blocked."""
+        data = await self._run(self._read_report, num_lines, timeout)
+        lines = data.decode().split(self.eol.decode(), num_lines)[:num_lines]
+        return [line.strip() for line in lines]
+
+    def _read_report(self, num_lines, timeout):
+        """Block until `num_lines` terminators have arrived."""
+        port = self._port()
+        deadline = time.monotonic() + timeout
+        data = b''
+        while data.count(self.eol) < num_lines:
+            if time.monotonic() > deadline:
+                raise asyncio.TimeoutError
+            data += port.read_until(self.eol)
+        return data
 
     def close(self):
         """Release resources."""
-        self.ser.close()
+        if self.open:
+            self._port().close()
+        self.open = False
+
+    async def close_async(self):
+        """Release resources without blocking the event loop."""
+        if self.open:
+            port = self._port()
+            self.open = False
+            await self._run(port.close)
 
     async def _handle_connection(self):
-        self.open = True
+        """Open the serial port on first use."""
+        if self.open:
+            return
+        try:
+            await self._connect()
+            self.reconnecting = False
+        except serial.SerialException:
+            if not self.reconnecting:
+                logger.error(f'Opening {self.address} failed.')
+            self.reconnecting = True
 
-    async def _handle_communication(self):
-        pass
+    async def _handle_communication(self, command):
+        """Manage communication, including timeouts and logging."""
+        try:
+            await self._write(command)
+            result = await self._readlines(27)
+            self.timeouts = 0
+            return result
+        except (asyncio.TimeoutError, serial.SerialException) as e:
+            self.timeouts += 1
+            if self.timeouts == self.max_timeouts:
+                logger.error(f'Reading from {self.address} timed out '
+                             f'{self.timeouts} times.')
+            logger.exception(f'Exception: {e}')
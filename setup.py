@@ -6,7 +6,7 @@ with open('README.md') as in_file:
 
 setup(
     name='copley',
-    version="0.1.1",
+    version="0.2.0",
     description='Python driver for Copley Tapped Density Tester.',
     long_description=long_description,
     long_description_content_type='text/markdown',
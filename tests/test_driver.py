@@ -1,12 +1,60 @@
 """Test the copley driver responds with correct data."""
+import asyncio
+import socket
+import struct
 from unittest import mock
 
 import pytest
+import serial
 
 from copley import command_line
-from copley.mock import TapDensity
+from copley.driver import (
+    _LABELS,
+    Report,
+    _index_by_prefix,
+    _parse_report,
+    _scan_report,
+)
+from copley.driver import TapDensity as RealTapDensity
+from copley.mock import NO_RESPONSE, TapDensity
+from copley.util import TcpClient
 
 ADDRESS = '192.168.10.18:23'
+REPORT = [
+    'Copley Scientific',
+    'JV1000i Tapped Density Tester',
+    '',
+    'Serial number       : 12345',
+    'Firmware version    : 1.02',
+    'Date                : 2023-06-01',
+    'Time                : 14:32:07',
+    '',
+    'Tapped Density Test',
+    'Calculation type    : Fixed weight',
+    'Set Speed           : 300',
+    'Total Taps          : 1250',
+    '',
+    'Sample Weight, W    : 2.77',
+    'Initial Volume (mL) : 170.0',
+    'Final Volume        : 155.0',
+    '',
+    'Results',
+    'Bulk Density        : 0.016',
+    'Tapped Density (g/mL): 0.018',
+    'Hausner Ratio       : 1.097',
+    'Compress. Index     : 8.82',
+    '',
+    'Operator            :',
+    'Signature           :',
+    '',
+    'End of report',
+]
+
+
+@pytest.fixture(autouse=True)
+def clear_parse_cache():
+    """Keep parsed reports from leaking between tests."""
+    _parse_report.cache_clear()
 
 
 @pytest.fixture
@@ -15,6 +63,13 @@ def driver():
     return TapDensity(ADDRESS)
 
 
+@mock.patch('copley.TapDensity', TapDensity)
+def test_driver_cli_no_response(capsys):
+    """Confirm the commandline interface reports an unresponsive device as off."""
+    command_line([NO_RESPONSE])
+    assert '"on": false' in capsys.readouterr().out
+
+
 @mock.patch('copley.TapDensity', TapDensity)
 def test_driver_cli(capsys):
     """Confirm the commandline interface works."""
@@ -23,3 +78,147 @@ def test_driver_cli(capsys):
     assert "bulk_density" in captured.out
     assert "tapped_density" in captured.out
     assert "null" not in captured.out
+
+
+async def test_mock_no_response():
+    """Confirm an unresponsive device reports as off."""
+    async with TapDensity(NO_RESPONSE) as copley:
+        assert await copley.get_report() is None
+
+
+async def test_concurrent_query(driver):
+    """Confirm overlapping queries are rejected rather than interleaved."""
+    async def slow_write_and_read(command):
+        await asyncio.sleep(0.01)
+        return REPORT
+    driver.hw._write_and_read = slow_write_and_read
+    first = asyncio.ensure_future(driver.query(driver.PRINT_REPORT))
+    await asyncio.sleep(0)
+    with pytest.raises(RuntimeError):
+        await driver.query(driver.PRINT_REPORT)
+    assert await first == REPORT
+    assert await driver.query(driver.PRINT_REPORT) == REPORT
+
+
+def test_parse_report():
+    """Confirm a full report is parsed into typed fields."""
+    report = RealTapDensity(ADDRESS)._parse(REPORT)
+    assert report == Report(
+        serial_number=12345,
+        calc_type="Fixed weight",
+        set_speed="300",
+        total_taps=1250,
+        sample_weight="2.77",
+        init_volume="170.0",
+        final_volume="155.0",
+        bulk_density="0.016",
+        tapped_density="0.018",
+        hausner_ratio="1.097",
+        compress_index="8.82",
+    )
+
+
+def test_scan_report_labels():
+    """Confirm a line for each label is found, even with shared or short prefixes."""
+    result, _ = _scan_report(tuple(f'{label}: 1' for label in _LABELS))
+    assert result.keys() == set(Report.__slots__)
+
+    labels = ('Tapped Density (g/mL)', 'Tapped Volume', 'Set', 'Bulk Density')
+    prefix_len, index = _index_by_prefix(labels)
+    lines = tuple(f'{label} : {n}' for n, label in enumerate(reversed(labels)))
+    with mock.patch.multiple('copley.driver', _LABELS=labels, _KEYS=labels,
+                             _CONVERTERS=(int,) * len(labels),
+                             _PREFIX_LEN=prefix_len, _PREFIX_INDEX=index):
+        result, _ = _scan_report(lines)
+    assert result == {label: n for n, label in enumerate(reversed(labels))}
+
+
+def test_parse_layout():
+    """Confirm a later report with the same layout is read by line position."""
+    driver = RealTapDensity(ADDRESS)
+    driver._parse(REPORT)
+    assert driver._layout
+    report = [line.replace('0.018', '0.020') for line in REPORT]
+    with mock.patch('copley.driver._scan_report') as scan:
+        assert driver._parse(report).tapped_density == '0.020'
+    scan.assert_not_called()
+
+
+def test_parse_layout_change():
+    """Confirm a report whose lines have moved is still parsed correctly."""
+    driver = RealTapDensity(ADDRESS)
+    expected = driver._parse(REPORT)
+    assert driver._parse(REPORT[1:]) == expected
+    assert driver._parse(['New firmware line', *REPORT]) == expected
+
+
+def test_parse_incomplete():
+    """Confirm a truncated report names the fields it is missing."""
+    with pytest.raises(ValueError, match='compress_index, hausner_ratio'):
+        RealTapDensity(ADDRESS)._parse(REPORT[:20])
+
+
+def test_parse_no_response():
+    """Confirm a missing response reports the device as off."""
+    assert RealTapDensity(ADDRESS)._parse(None) is None
+
+
+async def test_tcp_readlines():
+    """Confirm a report arriving in arbitrary chunks is split into lines."""
+    client = TcpClient(ADDRESS)
+    reader = asyncio.StreamReader()
+    client.connection = {'reader': reader}
+    client.open = True
+    data = '\r'.join(REPORT).encode() + b'\r'
+    reader.feed_data(data[:100])
+    reader.feed_data(data[100:])
+    assert await client._readlines(len(REPORT)) == REPORT
+
+
+async def test_tcp_session():
+    """Confirm a report round trip over TCP, and that exit closes the socket."""
+    async def handle(reader, writer):
+        assert await reader.readuntil(b'\r') == b'PR\r'
+        writer.write('\r'.join(REPORT).encode() + b'\r')
+        await writer.drain()
+        await reader.read()  # wait for the client to hang up
+        writer.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server, RealTapDensity(f'127.0.0.1:{port}', connect_timeout=2) as copley:
+        report = await copley.get_report()
+        assert report.tapped_density == "0.018"
+    assert not copley.hw.open
+
+
+async def test_tcp_connection_reset():
+    """Confirm a link reset mid-report reads as off and still exits cleanly."""
+    async def handle(reader, writer):
+        await reader.readuntil(b'\r')
+        sock = writer.get_extra_info('socket')
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+        writer.close()  # zero linger sends RST
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server, RealTapDensity(f'127.0.0.1:{port}', connect_timeout=2) as copley:
+        assert await copley.get_report() is None
+    assert not copley.hw.open
+
+
+@mock.patch('serial.Serial', lambda port, **kwargs: serial.serial_for_url('loop://', **kwargs))
+async def test_serial_close():
+    """Confirm the serial port opens on first write and closes on exit."""
+    async with RealTapDensity('/dev/ttyFAKE') as copley:
+        await copley.reset()
+        port = copley.hw.ser
+        assert port.is_open
+    assert not port.is_open
+    assert not copley.hw.open
+
+
+async def test_serial_missing_port():
+    """Confirm writing to a port that cannot be opened raises a serial error."""
+    with pytest.raises(serial.SerialException):
+        await RealTapDensity('/dev/ttyDOESNOTEXIST').reset()